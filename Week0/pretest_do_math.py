@@ -1,139 +1,162 @@
+import re
+
+# A token is either a whole (multi-digit) number or one of '(', ')', '*', '+'
+_TOKEN_RE = re.compile(r'\d+|[()+*]')
+
+# Operator codes, ops[i] sits between values[i] and values[i + 1]
+OP_MUL = 0
+OP_ADD = 1
+
+_OP_CODES = {'*': OP_MUL, '+': OP_ADD}
+
+
 # Execute a mathematical operation
 # Only Multiplication, Addition, and Parenthesis are allowed on NON-negative integers
 # Follows modified PEMDAS: Parenthesis, Multiplication, Addition
-# Nested parenthesis are processed recursively
+# Each parenthesis is reduced to a flat list of values and operator codes, evaluated as soon as it closes
 # Examples: 1+2; 5; 1+2*3; (1+2) * 3; (4 + 3) * (9 + 1) * (4 + (4 + ( 4 + 4 )))
 def do_math(statement):
-    # Hold each individual portion of the problem
-    open_statements = []
-    # How many parenthesis the parse has open right now
-    currently_open_pars = 0
-    # The current statement we are parsing
-    current_statement = ""
-    # The current number we are parsing
-    current_number = ""
-
-    # Begin parsing
-    for symbol in statement:
-        # Ignore spaces
-        if symbol == ' ':
-            continue
+    # Split the statement into numbers and symbols in a single regex pass
+    statement = statement.replace(' ', '')
+    tokens = _TOKEN_RE.findall(statement)
+
+    # findall skips anything that isn't a token, those characters make the statement invalid
+    if not sum(map(len, tokens)) == len(statement):
+        return None
 
-        par_val = parenthesis_value(symbol)
+    if not tokens:
+        return 0
 
-        # Check if we're opening new parenthesis
-        if par_val == 1:
-            currently_open_pars += par_val
+    # One (values, ops) group for the whole statement, plus one for every open parenthesis
+    groups = [([], bytearray())]
 
-        # Parsing multi-digit numbers
-        try:
-            # See if its a number
-            current_number += int(symbol)
-            # Pass it to the next iteration to see if the number continues
+    for token in tokens:
+        values, ops = groups[-1]
+
+        if token == '(':
+            groups.append(([], bytearray()))
             continue
-        except:
-            pass
-
-        # Current symbol must be one of '(', ')', '*', '+'
-
-        # Parse the previous int, if it exists and we have nothing more to add to it
-        if not current_number == "":
-            # We have a number stored
-            current_statement += int(current_number)
-            # Reset it
-            current_number = ""
-
-        # Add the current symbol (if it is either 1. the first/last parenthesis OR 2. not a parenthesis
-        if not abs(par_val) == currently_open_pars or par_val == 0:
-            current_statement += symbol
-
-        was_complex_statement = currently_open_pars > 0
-
-        # Check if we just closed the parenthesis
-        if par_val == -1:
-            currently_open_pars += par_val
-
-        # Check if we can push the value to the open statements
-        if currently_open_pars == 0:
-            # Push the statement to the list
-            if was_complex_statement:
-                open_statements.append(do_math(current_statement))
-            else:
-                open_statements.append(current_statement)
-
-            # Reset
-            current_statement = ""
-        elif currently_open_pars < 0:
-            return None
-
-    if not current_number == "":
-        # If the last character is a digit the loop won't automatically add it
-        open_statements.append(current_number)
-        current_number = ""
-
-    if not currently_open_pars == 0:
+
+        if token == ')':
+            # Closed a parenthesis that was never opened
+            if len(groups) == 1:
+                return None
+
+            groups.pop()
+            token = evaluate_group(values, ops)
+
+            if token is None:
+                return None
+
+            values, ops = groups[-1]
+
+        if token in _OP_CODES:
+            # An operator must follow a value
+            if not len(values) == len(ops) + 1:
+                return None
+
+            ops.append(_OP_CODES[token])
+        else:
+            # A value must follow an operator (or start the group)
+            if not len(values) == len(ops):
+                return None
+
+            values.append(int(token))
+
+    # Opened a parenthesis that was never closed
+    if not len(groups) == 1:
         return None
 
-    return execute(open_statements)
+    return evaluate_group(*groups[0])
 
 
-# Get the increment value for a symbol
-# -1 = Closing, 0 = None, 1 = Opening
-def parenthesis_value(symbol):
-    if symbol == '(':
-        return 1
-    elif symbol == ')':
-        return -1
-    else:
-        return 0
+# Computes the result of a flat group of values and the operator codes between them
+# Returns None if the group is empty or ends with an operator
+def evaluate_group(values, ops):
+    if not len(values) == len(ops) + 1:
+        return None
+
+    # Multiply values into the current term and add finished terms to the total
+    total = 0
+    term = values[0]
+
+    for index in range(len(ops)):
+        if ops[index] == OP_MUL:
+            term *= values[index + 1]
+        else:
+            total += term
+            term = values[index + 1]
+
+    return total + term
+
+
+# Marks that a list of components has run out
+_END = object()
 
 
 # Computes the result of an array representing a mathematical equation
 # Acceptable components: integer, '+', '*'
-# Components may also be another list of components that will be processed recursively
+# Components may also be another list of components, these are processed with an explicit stack (not recursion)
 # Returns the integer result or an exception
 def execute(components):
-    # If a component is an array (subcomponent) execute this method on it first
-    preprocessed = []
+    # Each frame holds [remaining components, sum of finished terms, product of the current term (None if empty)]
+    stack = [[iter(components), 0, None]]
+
+    while True:
+        frame = stack[-1]
+        component = next(frame[0], _END)
+
+        if component is _END:
+            # This list is done, its value goes into the term of the list that contained it
+            stack.pop()
+            value = frame[1] + frame[2] if frame[2] is not None else frame[1]
+
+            if not stack:
+                return value
 
-    for component in components:
-        if type(component) == 'list':
-            # subcomponent
-            preprocessed.append(execute(component))
+            frame = stack[-1]
+        elif component == '*':
+            continue
+        elif component == '+':
+            if frame[2] is not None:
+                frame[1] += frame[2]
+                frame[2] = None
+
+            continue
+        elif isinstance(component, list):
+            # subcomponent, finish it before carrying on with this list
+            stack.append([iter(component), 0, None])
+            continue
         else:
-            preprocessed.append(component)
-
-    # All the indexes we need to multiply at
-    multiply = []
-
-    for index in range(0, len(preprocessed)):
-        component = preprocessed[index]
-
-        if component == '*':
-            multiply.append(index)
-
-    # Process multiplication from back to front
-    # Processing from back to front ensures that sequential multiplication operations can be processed correctly
-    for index in reversed(multiply):
-        # Get the values on either side
-        val_one = int(preprocessed[index - 1])
-        val_two = int(preprocessed[index + 1])
-
-        # Replace the operator with the processed value
-        preprocessed[index] = val_one * val_two
-
-        # Remove the values on either side
-        preprocessed.pop(index + 1)
-        preprocessed.pop(index - 1)
-
-    # All sub-components (parenthesis) and multiplication operations have been simplified to one value
-    # Assuming the remaining components need to be added together
-    result = 0
-    for component in preprocessed:
-        try:
-            result += int(component)
-        except:
-            # Probably a '+'
-            pass
-
-    return result
+            value = int(component)
+
+        frame[2] = value if frame[2] is None else frame[2] * value
+
+
+# TESTING
+
+# Multi-digit numbers
+assert do_math("12 + 345") == 357
+assert do_math("5") == 5
+assert do_math("") == 0
+# Multiplication before addition
+assert do_math("1+2*3") == 7
+assert do_math("2*3+4*5") == 26
+# Parenthesis (nested) before anything else
+assert do_math("(1+2) * 3") == 9
+assert do_math("(4 + 3) * (9 + 1) * (4 + (4 + ( 4 + 4 )))") == 1120
+# Invalid statements
+assert do_math("2+3x") is None
+assert do_math("hello world") is None
+assert do_math("1-1") is None
+assert do_math("7*") is None
+assert do_math("(2)(3)") is None
+assert do_math("(1+2") is None
+assert do_math("1+2)") is None
+
+assert evaluate_group([2, 3, 4], bytearray([OP_ADD, OP_MUL])) == 14
+assert evaluate_group([1, 2], bytearray()) is None
+
+assert execute([1, '+', 2, '*', [3, '+', 4]]) == 15
+assert execute([[2, '*', [1, '+', 1]], '*', 3, '+', 1]) == 13
+assert execute([7]) == 7
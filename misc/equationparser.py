@@ -8,11 +8,12 @@ from misc.pyparse import mapping as m
 
 from misc.pyparse.pyparse import ParserState
 
-__operation = p.string(('*', '/', '+', '-', '%', '^'))
+__operation = p.one_of('*/+-%^')
 
-__numerical_constant = p.regex('([0-9]|e|pi)+')
+__numerical_constant = p.regex(r'(?:[0-9e]|pi)+', '0123456789ep')
 
-__parenthesis = p.many(p.lazy(lambda: __statement.between(p.string('('), p.string(')')))).map(m.singleton_list_unpacker)
+# Only the statement itself has to be lazy, keeping '(' visible lets __expression pick this branch by its first char
+__parenthesis = p.many(p.lazy(lambda: __statement).between(p.string('('), p.string(')'))).map(m.singleton_list_unpacker)
 
 __expression = p.any_of(
     # Recursively add parenthesis, which contain a value (which could be more parenthesis)
@@ -71,6 +72,22 @@ def test_equation(case: TestCase) -> ParserState:
     return final_state
 
 
+def test_memoized_equation(case: TestCase) -> ParserState:
+    equation = case.equation.replace(' ', '')
+
+    plain_state = __statement.run(equation)
+    memoized_state = __statement.run(equation, memoize=True)
+
+    # Memoizing may only skip work, never change what was parsed
+    for field in ('result', 'index', 'furthest_index', 'is_error', 'errors'):
+        assert getattr(plain_state, field) == getattr(memoized_state, field), \
+            """Memoized {} did not match the plain run
+        Plain   : `{}`
+        Memoized: `{}`""".format(field, getattr(plain_state, field), getattr(memoized_state, field))
+
+    return memoized_state
+
+
 # I don't like math
 tests = [
     TestCase(equation="1",
@@ -105,6 +122,7 @@ for idx, test in enumerate(tests):
     print("Test {}/{}".format(idx + 1, len(tests)))
 
     result = test_equation(test)
+    test_memoized_equation(test)
 
     print("Passed! Results:")
     print("\n###########################\n")
@@ -118,8 +136,17 @@ for idx, test in enumerate(tests):
 
     print()
 
-    print("Maximum Call Depth   :", p.max_call_depth, "method calls")
     print("Total Transformations:", p.ParserState.total_transformations)
 
+# Packrat parsing is meant for deeply nested input, so a memoized run has to get through that too
+print("\n###########################\n")
+print("Test nested parenthesis")
+
+nested_depth = 40
+test_memoized_equation(TestCase(equation='(' * nested_depth + '1' + ')' * nested_depth,
+                                expected_result=None, expected_value=1))
+
+print("Passed!")
+
 print("\n###########################\n")
 print("All tests passed!")
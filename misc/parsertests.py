@@ -0,0 +1,226 @@
+import contextlib
+import dataclasses
+import io
+from typing import Any
+
+from misc.pyparse import parsers as p
+
+from misc.pyparse.pyparse import ParserState
+
+
+# TESTING
+
+
+@dataclasses.dataclass
+class TestCase:
+    name: str
+    parser: p.PyParse
+    target: str
+    expected_result: Any
+    # Set if the parser must fail, the errors must contain this message
+    expected_error: str = None
+
+
+def test_parser(case: TestCase) -> ParserState:
+    final_state = case.parser.run(case.target)
+
+    if case.expected_error is not None:
+        assert final_state.is_error, "Expected an error, matched `{}`".format(final_state.result)
+        assert any(case.expected_error in error for error in final_state.errors), \
+            """Errors did not contain the expected error
+        Expected: `{}`
+        Actual  : `{}`""".format(case.expected_error, final_state.errors)
+    else:
+        assert not final_state.is_error, "Expected a match, failed with {}".format(final_state.errors)
+
+        assert case.expected_result == final_state.result, \
+            """Results did not match expected
+        Expected: `{}`
+        Actual  : `{}`""".format(case.expected_result, final_state.result)
+
+        # A cut only commits the choices inside the parser, never the caller
+        assert not final_state.committed, "A successful run left the state committed"
+
+    memoized_state = case.parser.run(case.target, memoize=True)
+
+    # Memoizing may only skip work, never change what was parsed
+    for field in ('result', 'index', 'furthest_index', 'is_error', 'errors'):
+        assert getattr(final_state, field) == getattr(memoized_state, field), \
+            """Memoized {} did not match the plain run
+        Plain   : `{}`
+        Memoized: `{}`""".format(field, getattr(final_state, field), getattr(memoized_state, field))
+
+    # Debugging turns off every scan and combined pattern, so this checks them against the transformers
+    p.setup_debugging(True)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generic_state = case.parser.run(case.target)
+
+    p.setup_debugging(False)
+
+    for field in ('result', 'index', 'furthest_index', 'is_error', 'errors'):
+        assert getattr(final_state, field) == getattr(generic_state, field), \
+            """{} did not match the generic path
+        Fast   : `{}`
+        Generic: `{}`""".format(field, getattr(final_state, field), getattr(generic_state, field))
+
+    return final_state
+
+
+s = p.string
+
+tests = [
+    # cut()
+    TestCase(name="any_of tries the next alternative without a cut",
+             parser=p.any_of(p.sequence_of(s('a'), s('b')), s('ac')), target="ac",
+             expected_result='ac'),
+    TestCase(name="any_of stops at a cut",
+             parser=p.any_of(p.sequence_of(p.cut(s('a')), s('b')), s('ac')), target="ac",
+             expected_result=None, expected_error="Expected 'b'"),
+    TestCase(name="a cut commits every choice above it",
+             parser=p.any_of(p.any_of(p.sequence_of(p.cut(s('a')), s('b')), s('ax')), s('ac')), target="ac",
+             expected_result=None, expected_error="Expected 'b'"),
+    TestCase(name="a cut before an alternative's match is not a commitment",
+             parser=p.any_of(p.sequence_of(p.cut(s('b')), s('c')), s('ac')), target="ac",
+             expected_result='ac'),
+    TestCase(name="a cut inside an alternative that matched does not commit the next choice",
+             parser=p.sequence_of(p.any_of(p.sequence_of(p.cut(s('a')), s('b')), s('x')),
+                                  p.any_of(s('cd'), s('ce'))), target="abce",
+             expected_result=[['a', 'b'], 'ce']),
+    TestCase(name="optional can't match nothing once its target got past a cut",
+             parser=p.sequence_of(p.optional(p.sequence_of(p.cut(s('a')), s('b'))), s('ac')), target="ac",
+             expected_result=None, expected_error="Expected 'b'"),
+    TestCase(name="a repetition past a cut must complete",
+             parser=p.any_of(p.sequence_of(p.many(p.sequence_of(p.cut(s('a')), s('b'))), s('x')), s('aaq')),
+             target="aaq",
+             expected_result=None, expected_error="Expected 'b'"),
+    TestCase(name="a cut in a finished repetition does not commit the caller",
+             parser=p.any_of(p.sequence_of(p.many(p.sequence_of(p.cut(s('a')), s('b'))), s('x')), s('abq')),
+             target="abq",
+             expected_result='abq'),
+    TestCase(name="a value past a cut must complete",
+             parser=p.any_of(p.sequence_of(p.seperated_by(s(','), p.sequence_of(p.cut(s('a')), s('b'))), s('x')),
+                             s('ab,aq')), target="ab,aq",
+             expected_result=None, expected_error="Expected 'b'"),
+    TestCase(name="a cut in a finished value does not commit the caller",
+             parser=p.any_of(p.sequence_of(p.seperated_by(s(','), p.sequence_of(p.cut(s('a')), s('b'))), s('x')),
+                             s('ab,q')), target="ab,q",
+             expected_result='ab,q'),
+    TestCase(name="a seperator past a cut requires a next value",
+             parser=p.any_of(p.seperated_by(p.cut(s(',')), s('a')), s('a,b')), target="a,b",
+             expected_result=None, expected_error="Expected 'a'"),
+
+    # seperated_by(..., keep_seperators=False)
+    TestCase(name="seperators are kept by default",
+             parser=p.seperated_by(s(','), s('a')), target="a,a,a",
+             expected_result=['a', ',', 'a', ',', 'a']),
+    TestCase(name="seperators can be left out",
+             parser=p.seperated_by(s(','), s('a'), keep_seperators=False), target="a,a,a",
+             expected_result=['a', 'a', 'a']),
+    TestCase(name="seperators can be left out of a combined pattern",
+             parser=p.seperated_by(p.regex(r' *, *'), p.regex('[0-9]+'), keep_seperators=False), target="1 , 22,3",
+             expected_result=['1', '22', '3']),
+    TestCase(name="a trailing seperator is left out either way",
+             parser=p.seperated_by(s(','), p.regex('[0-9]+')), target="1,2,",
+             expected_result=['1', ',', '2']),
+    TestCase(name="seperators can be left out of a scan",
+             parser=p.seperated_by(s('+'), p.many(s('a')), keep_seperators=False), target="aa+a+",
+             expected_result=[['a', 'a'], ['a']]),
+    TestCase(name="seperators can be left out without a scan",
+             parser=p.seperated_by(s('+'), p.lazy(lambda: s('a')), keep_seperators=False), target="a+a+b",
+             expected_result=['a', 'a']),
+
+    # one_of / any_of as patterns
+    TestCase(name="one_of is part of a combined sequence",
+             parser=p.sequence_of(s('x'), p.one_of('+-'), p.DIGITS), target="x-12",
+             expected_result=['x', '-', '12']),
+    TestCase(name="one_of escapes its characters",
+             parser=p.sequence_of(p.one_of('^-]\\'), s('a')), target="]a",
+             expected_result=[']', 'a']),
+    TestCase(name="one_of fails in a combined sequence",
+             parser=p.sequence_of(s('x'), p.one_of('+-'), s('1')), target="x*1",
+             expected_result=None, expected_error="Expected one of '+-'"),
+    TestCase(name="one_of is repeated as a pattern",
+             parser=p.many(p.one_of('ab')), target="abbac",
+             expected_result=['a', 'b', 'b', 'a']),
+    TestCase(name="any_of takes the first alternative that matches",
+             parser=p.sequence_of(p.any_of(s('a'), p.regex('[a-z]+')), s('b')), target="ab",
+             expected_result=['a', 'b']),
+    TestCase(name="any_of doesn't give back what a regex matched in a combined sequence",
+             parser=p.sequence_of(p.any_of(p.regex('a+'), s('x')), s('a')), target="aaa",
+             expected_result=None, expected_error="reached EOF"),
+    TestCase(name="any_of is a seperated_by pattern",
+             parser=p.seperated_by(p.one_of('+-'), p.any_of(p.DIGITS, s('pi'))), target="1+pi-22",
+             expected_result=['1', '+', 'pi', '-', '22']),
+    TestCase(name="any_of is repeated as a pattern",
+             parser=p.many(p.any_of(s('ab'), p.regex('[0-9]'))), target="ab1ab2x",
+             expected_result=['ab', '1', 'ab', '2']),
+    TestCase(name="any_of keeps a regex with inline flags out of combined patterns",
+             parser=p.sequence_of(p.any_of(p.regex('(?i)a'), s('b')), s('c')), target="Ac",
+             expected_result=['A', 'c']),
+    TestCase(name="any_of fails at the end of the target",
+             parser=p.sequence_of(s('a'), p.any_of(s('b'), p.regex('c*'))), target="a",
+             expected_result=None, expected_error="any_of"),
+]
+
+
+def test_memoize():
+    calls = []
+
+    def count(result):
+        calls.append(result)
+        return result
+
+    # lazy() has no scan, so every match of the number goes through the memoized transformer
+    number = p.lazy(lambda: p.regex('[0-9]+')).map(count).memoize()
+    expression = p.any_of(p.sequence_of(number, s('+')), p.sequence_of(number, s('-')), number)
+
+    for target, expected_result in (("12-", ['12', '-']), ("3", '3'), ("12-", ['12', '-'])):
+        calls.clear()
+        final_state = expression.run(target)
+
+        assert final_state.result == expected_result, \
+            """Results did not match expected
+        Expected: `{}`
+        Actual  : `{}`""".format(expected_result, final_state.result)
+
+        # Each alternative retries the number at index 0, every run starts with an empty cache
+        assert len(calls) == 1, "Expected the number to be parsed once, it was parsed {} times".format(len(calls))
+
+    # The furthest index of a cached result must not depend on which caller got there first
+    def build(rule: p.PyParse) -> p.PyParse:
+        return p.sequence_of(p.many(p.sequence_of(s('a'), p.optional(p.sequence_of(s('b'), s('c'), s('Q'))), rule,
+                                                  s('Z')), 0),
+                             s('a'), rule)
+
+    plain_state = build(p.lazy(lambda: s('b'))).run("abcx")
+    memoized_state = build(p.lazy(lambda: s('b')).memoize()).run("abcx")
+
+    for field in ('result', 'index', 'furthest_index', 'is_error', 'errors'):
+        assert getattr(plain_state, field) == getattr(memoized_state, field), \
+            """Memoized {} did not match the plain run
+        Plain   : `{}`
+        Memoized: `{}`""".format(field, getattr(plain_state, field), getattr(memoized_state, field))
+
+
+for idx, test in enumerate(tests):
+    p.setup_debugging(False)
+
+    print("\n###########################\n")
+    print("Test {}/{}: {}".format(idx + 1, len(tests), test.name))
+
+    result = test_parser(test)
+
+    print("Passed! Results:")
+    print("Input :", test.target)
+    print("Output:", result.get_string_result() if not result.is_error else result.errors)
+
+print("\n###########################\n")
+print("Test memoize()")
+
+test_memoize()
+
+print("Passed!")
+
+print("\n###########################\n")
+print("All tests passed!")
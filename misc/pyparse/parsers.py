@@ -1,64 +1,99 @@
 from misc.pyparse.pyparse import *
+import misc.pyparse.pyparse as pyparse
 import re
+import string as string_module
 from re import Pattern
 
 
 def string(to_match: str | tuple[str, ...]) -> PyParse:
     """Match a string exactly. Will traverse the target if enabled
 
-    If a tuple[str, ...] is supplied a regex parser will be returned as `(to_match[0])|...`"""
+    If a tuple[str, ...] is supplied a regex parser will be returned as `(?:to_match[0]|...)`,
+    the longest alternatives are tried first"""
 
     if isinstance(to_match, tuple):
         # If we want to find any of a set of strings, it's easiest to use a regex
-        reg = "({})".format(')|('.join([re.escape(str(x)) for x in to_match]))
+        # Regex alternation takes the first alternative that matches, so longer strings go first (ie. '**' before '*')
+        alternatives = sorted([str(x) for x in to_match], key=len, reverse=True)
+        reg = "(?:{})".format('|'.join([re.escape(x) for x in alternatives]))
 
-        debug("string: matching '{}' using regex `{}`".format(to_match, reg))
+        if pyparse.do_debugging:
+            debug("string: matching '{}' using regex `{}`".format(to_match, reg))
 
-        return regex(reg)
+        # Every alternative is a literal, so the first characters are known unless one of them is empty
+        return regex(reg, ''.join(str(x)[0] for x in to_match) if all(to_match) else None)
+
+    length = len(to_match)
 
     def find_string_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
-        # First index to search on
-        c_idx = state.index
-
-        while True:
-            # Check if theres anything left
-            if state.is_remaining_target_empty(c_idx):
-                return state.error_target_empty("string")
-
-            # Get the current position onward
-            current = state.get_target_segment(c_idx)
-
-            debug("string: matching '{}' in '{}' (index {})".format(to_match, current, c_idx))
-
-            if current.startswith(to_match):
-                # Found it
-                return state.update_result_and_index(to_match, c_idx + len(to_match))
+        # Check if theres anything left
+        if state.is_remaining_target_empty():
+            return state.error_target_empty("string")
+
+        if pyparse.do_debugging:
+            debug("string: matching '{}' in '{}' (index {})".format(to_match,
+                                                                    state.get_target_segment(),
+                                                                    state.index))
+
+        target = state.target
+        index = state.index
+
+        if state.traverse:
+            # We are allowed to search forward, let str.find do the scanning
+            c_idx = target.find(to_match, index)
+        else:
+            # Compare in place, without slicing off the rest of the target
+            c_idx = index if target.startswith(to_match, index) else -1
+
+        if c_idx >= 0:
+            # Found it
+            return state.update_result_and_index(to_match, c_idx + length)
+
+        # We are not allowed or have no chance to find the string
+        return state.add_error(
+            "string: Expected '{}', found '{}{}'".format(
+                to_match,
+                state.get_target_segment() if state.traverse else target[index:index + length + 10],
+                "..." if state.has_chars_remaining(11) else "")
+        )
+
+    def scan_string(target: str, index: int) -> tuple[int | None, str, int]:
+        if target.startswith(to_match, index):
+            end = index + length
+            return end, to_match, end
+
+        return None, None, index
+
+    # An empty string would match at EOF, where the transformer reports an error, so it gets no scanner
+    return PyParse(find_string_transformer,
+                   frozenset(to_match[0]) if to_match else None,
+                   scan_string if to_match else None,
+                   to_match if to_match else None)
+
+
+def regex(t_pattern: Pattern[str] | str, first_chars: str = None) -> PyParse:
+    """Match a regex pattern
 
-            if state.traverse and state.has_chars_remaining(len(to_match), c_idx + 1):
-                # We are allowed to keep searching and have enough string to do so, increment go deeper
-                c_idx += 1
-                continue
-            else:
-                # We are not allowed or have no chance to find the string
-                return state.add_error(
-                    "string: Expected '{}', found '{}{}'".format(
-                        to_match,
-                        state.get_target_segment() if state.traverse else current[:len(to_match) + 10],
-                        "..." if len(state.get_target_segment()) > 10 else "")
-                )
+    Accepts a compiled regex pattern or a regex string. Patterns are matched at the current index of the target
+    (like `pattern.match(target, index)`), without slicing off the rest of the target. So:
 
-    return PyParse(find_string_transformer)
+        - A leading '^' is dropped, the match is already anchored at the current index
+        - Any other '^' and '\\A' only match at the start of the target, not the current index
+        - Lookbehinds can see the target before the current index
 
+    If every match of the pattern starts with one of `first_chars`, passing them lets any_of skip this parser"""
 
-def regex(t_pattern: Pattern[str] | str) -> PyParse:
-    """Match a regex pattern
+    pattern = re.compile(t_pattern) if isinstance(t_pattern, str) else t_pattern
 
-    Accepts a compiled regex pattern or a regex string"""
+    if isinstance(pattern.pattern, str) and pattern.pattern.startswith('^'):
+        # Pattern.match(target, index) is already anchored at index, a '^' would only ever match at index 0
+        pattern = re.compile(pattern.pattern[1:], pattern.flags)
 
-    pattern = re.compile('^' + t_pattern) if isinstance(t_pattern, str) else t_pattern
+    # Look the bound method up once instead of on every match
+    match_pattern = pattern.match
 
     def find_regex_transformer(state: ParserState) -> ParserState:
         if state.is_error:
@@ -67,56 +102,233 @@ def regex(t_pattern: Pattern[str] | str) -> PyParse:
         if state.is_remaining_target_empty():
             return state.error_target_empty("regex")
 
-        debug("regex: matching: '{}' in '{}'".format(pattern.pattern, state.get_target_segment()))
+        if pyparse.do_debugging:
+            debug("regex: matching: '{}' in '{}'".format(pattern.pattern, state.get_target_segment()))
 
-        match = pattern.match(state.get_target_segment())
+        target = state.target
+        index = state.index
+        match = match_pattern(target, index)
 
         if match is None:
             return state.add_error(
                 "regex: Expected '{}', found '{}{}'".format(pattern.pattern,
-                                                            state.get_target_segment()[:10],
-                                                            "..." if len(state.get_target_segment()) > 10 else "")
+                                                            target[index:index + 10],
+                                                            "..." if state.has_chars_remaining(11) else "")
             )
 
-        return state.update_result_shift_length(match.group(0))
+        return state.update_result_and_index(match.group(0), match.end())
+
+    def scan_regex(target: str, index: int) -> tuple[int | None, str, int]:
+        # The transformer reports EOF even if the pattern could match nothing
+        match = match_pattern(target, index) if index < len(target) else None
 
-    return PyParse(find_regex_transformer)
+        if match is None:
+            return None, None, index
+
+        end = match.end()
+        return end, match.group(0), end
+
+    return PyParse(find_regex_transformer,
+                   frozenset(first_chars) if first_chars is not None else None,
+                   scan_regex,
+                   pattern=pattern)
+
+
+def one_of(chars: str) -> PyParse:
+    """Match any single character in `chars`"""
+
+    char_set = frozenset(chars)
+
+    def one_of_transformer(state: ParserState) -> ParserState:
+        if state.is_error:
+            return state
+
+        if state.is_remaining_target_empty():
+            return state.error_target_empty("one_of")
 
+        current = state.target[state.index]
 
-DIGITS = regex('[0-9]+')
-LETTERS = regex('[A-Za-z]+')
+        if pyparse.do_debugging:
+            debug("one_of: matching one of '{}' against '{}'".format(chars, current))
+
+        if current in char_set:
+            return state.update_result_offset_index(current, 1)
+
+        return state.add_error("one_of: Expected one of '{}', found '{}'".format(chars, current))
+
+    def scan_one_of(target: str, index: int) -> tuple[int | None, str, int]:
+        if index < len(target):
+            char = target[index]
+
+            if char in char_set:
+                return index + 1, char, index + 1
+
+        return None, None, index
+
+    # The same match as a character class, so one_of can be part of combined patterns
+    return PyParse(one_of_transformer,
+                   char_set,
+                   scan_one_of,
+                   pattern=re.compile("[{}]".format(re.escape(chars))) if chars else None)
+
+
+DIGITS = regex('[0-9]+', string_module.digits)
+LETTERS = regex('[A-Za-z]+', string_module.ascii_letters)
+
+
+# A cut only commits to the choice (or repetition) it is in, so children of one are run uncommitted
+def _uncommitted(state: ParserState) -> ParserState:
+    return state.update(committed=False) if state.committed else state
+
+
+# Give a successful child state back the commitment of the state the choice (or repetition) started from
+def _with_commitment(new_state: ParserState, state: ParserState) -> ParserState:
+    return new_state if new_state.committed == state.committed else new_state.update(committed=state.committed)
 
 
 def optional(parser: PyParse) -> PyParse:
     """Make a target optional. Cannot be passed to many(). Instead to optional(many(target))"""
 
+    run_parser = parser.direct_runner()
+
     def optional_parser_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
-        debug("optional: attempting to match `{}` against '{}'".format(get_function_name(parser.state_transformer),
-                                                                       state.get_target_segment()))
+        if pyparse.do_debugging:
+            debug("optional: attempting to match `{}` against '{}'".format(get_function_name(parser.state_transformer),
+                                                                           state.get_target_segment()))
 
-        # Execute the target
-        temp_state = parser.state_transformer(state)
+        # Execute the target, a cut inside it only commits to the target
+        attempt = _uncommitted(state)
+        temp_state = (run_parser if state.memo is None else parser)(attempt)
 
         if temp_state.is_error:
+            if temp_state.committed:
+                # The target got past a cut, matching nothing is no longer an option
+                return temp_state
+
             # If an error occurs on an optional a blank result is set, ie. nothing happened, continue
             # The furthest index must be manually set since we are ignoring the previous state
-            debug("optional: no match")
+            if pyparse.do_debugging:
+                debug("optional: no match")
             return state.update_result_and_index(lambda: None, furthest_index=temp_state.furthest_index)
 
-        debug("optional: found match")
+        if pyparse.do_debugging:
+            debug("optional: found match")
 
         # Return the match
-        return temp_state
+        return _with_commitment(temp_state, state)
+
+    def scan_optional(target: str, index: int) -> tuple[int, Any, int]:
+        next_index, result, furthest_index = parser.scan(target, index)
+
+        if next_index is None:
+            # Nothing happened, but remember how far the target looked
+            return index, None, furthest_index
+
+        return next_index, result, furthest_index
+
+    return PyParse(optional_parser_transformer, scan=scan_optional if parser.scan is not None else None)
+
+
+# Flags set inside a pattern (ie. `(?i)`) would change a combined pattern, so those patterns are never combined
+_INLINE_FLAGS = re.compile(r'\(\?[aiLmsux-]+[:)]')
+
+_DEFAULT_FLAGS = re.compile('').flags
 
-    return PyParse(optional_parser_transformer)
+
+def _fragment(parser: PyParse) -> str | None:
+    """The regex source matching exactly what a literal string or regex parser matches, or None if there isn't one
+
+    The source of a regex is returned as is, so it may need a group around it"""
+
+    if parser.literal is not None:
+        return re.escape(parser.literal)
+
+    pattern = parser.pattern
+
+    if pattern is None or pattern.groups or pattern.flags != _DEFAULT_FLAGS:
+        return None
+
+    if _INLINE_FLAGS.search(pattern.pattern):
+        return None
+
+    return pattern.pattern
+
+
+def _combined_pattern(parsers: tuple[PyParse, ...]) -> Pattern[str] | None:
+    """Join literal string and regex parsers into a single pattern with one group per parser, in order
+
+    Returns None if there's nothing to gain or any of the parsers can't be joined"""
+
+    fragments = []
+
+    for position, parser in enumerate(parsers):
+        name = "p{}".format(position)
+        fragment = _fragment(parser)
+
+        if fragment is None:
+            return None
+
+        if parser.literal is not None:
+            fragments.append("(?P<{}>{})".format(name, fragment))
+            continue
+
+        # Like regex(), fail at EOF and never give back what was matched to let a later part match
+        # (a lookahead never backtracks into itself, so it matches atomically and the backreference consumes it)
+        fragments.append("(?=[\\s\\S])(?=(?P<{0}>{1}))(?P={0})".format(name, fragment))
+
+    if len(fragments) < 2:
+        return None
+
+    try:
+        return re.compile(''.join(fragments))
+    except re.error:
+        return None
 
 
 def sequence_of(*parsers: PyParse) -> PyParse:
     """Match a sequence of parsers"""
 
+    # If every parser can scan, the whole sequence can too
+    scanners = tuple(parser.scan for parser in parsers) if parsers and all(parser.scan for parser in parsers) else None
+
+    def scan_sequence(target: str, index: int) -> tuple[int | None, list, int]:
+        results = []
+        furthest = index
+        has_none = False
+
+        for scan in scanners:
+            index, result, furthest_index = scan(target, index)
+
+            if furthest < furthest_index:
+                furthest = furthest_index
+
+            if index is None:
+                return None, None, furthest
+
+            if result is None:
+                has_none = True
+
+            results.append(result)
+
+        return index, [result for result in results if result is not None] if has_none else results, furthest
+
+    # A sequence of just literals and regexes can be matched by one combined pattern
+    combined = _combined_pattern(parsers) if scanners is not None else None
+
+    def scan_combined(target: str, index: int) -> tuple[int | None, list, int]:
+        match = combined.match(target, index)
+
+        if match is None:
+            # Only the parser by parser scan knows how far the target was looked at
+            return scan_sequence(target, index)
+
+        return match.end(), list(match.groups()), match.end()
+
+    runners = tuple(parser.direct_runner() for parser in parsers)
+
     def parser_sequence_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
@@ -124,161 +336,495 @@ def sequence_of(*parsers: PyParse) -> PyParse:
         results = []
         current = state
 
-        for index, parser in enumerate(parsers):
+        # Children that can scan only move these along, a state is built just before a child that needs one
+        index = state.index
+        furthest = state.furthest_index
+        scanning = not state.traverse and not pyparse.do_debugging
+        behind = False
+        # Results are only filtered (copied) if a child gave None
+        has_none = False
+
+        for position, (parser, run_parser) in enumerate(zip(parsers, runners)):
             # Parsers are chained together, each will work on the state the previous one was working on
 
-            debug("sequence ({}/{}): matching `{}` against '{}'".format(index + 1,
-                                                                        len(parsers),
-                                                                        get_function_name(parser.state_transformer),
-                                                                        current.get_target_segment()))
+            if scanning and parser.scan is not None:
+                next_index, result, furthest_index = parser.scan(state.target, index)
+
+                if furthest < furthest_index:
+                    furthest = furthest_index
 
-            current = parser.state_transformer(current)
+                if next_index is not None:
+                    if result is None:
+                        has_none = True
+
+                    index = next_index
+                    results.append(result)
+                    behind = True
+                    continue
+
+            if behind or current.furthest_index != furthest:
+                # Catch up with the scanned children (failed scans are rerun to build their errors)
+                last_result = results[-1] if results else current.result
+                current = current.update_result_and_index(last_result if last_result is not None else lambda: None,
+                                                          index, furthest)
+                behind = False
+
+            if pyparse.do_debugging:
+                debug("sequence ({}/{}): matching `{}` against '{}'".format(position + 1,
+                                                                            len(parsers),
+                                                                            get_function_name(parser.state_transformer),
+                                                                            current.get_target_segment()))
+
+            current = (run_parser if state.memo is None else parser)(current)
 
             if current.is_error:
-                return current.add_error("sequence: component failed to match")
+                # The component's own error says what went wrong, like between() it is returned as is
+                return current
+
+            if current.result is None:
+                has_none = True
 
             results.append(current.result)
+            index = current.index
+            furthest = current.furthest_index
 
         # Move all the results back into the state
         if len(results) == 0:
             return state.add_error("sequence: parsers matched nothing!", current.furthest_index)
 
-        return current.update_result_and_index([result for result in results if result is not None])
+        if has_none:
+            results = [result for result in results if result is not None]
+
+        return current.update_result_and_index(results, index, furthest)
 
-    return PyParse(parser_sequence_transformer)
+    # A sequence starts wherever its first parser does
+    if combined is not None:
+        scan = scan_combined
+    else:
+        scan = scan_sequence if scanners is not None else None
+
+    return PyParse(parser_sequence_transformer, parsers[0].first_chars if parsers else None, scan)
 
 
 def any_of(*parsers: PyParse) -> PyParse:
-    """Match any one of the supplied parsers"""
+    """Match any one of the supplied parsers
+
+    Parsers are tried in order, skipping any whose first_chars can't start with the next character"""
+
+    # For every character some parser advertises, the parsers (in order) that could start with it
+    # Parsers with unknown first_chars are candidates for every character
+    unknown = tuple(parser for parser in parsers if parser.first_chars is None)
+    dispatch = {
+        char: tuple(parser for parser in parsers if parser.first_chars is None or char in parser.first_chars)
+        for known in parsers if known.first_chars is not None for char in known.first_chars
+    }
+
+    # The same candidates along with their direct runners
+    all_choices = tuple((parser, parser.direct_runner()) for parser in parsers)
+    unknown_choices = tuple((parser, parser.direct_runner()) for parser in unknown)
+    dispatch_choices = {
+        char: tuple((parser, parser.direct_runner()) for parser in candidates) for char, candidates in dispatch.items()
+    }
 
     def any_parser_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
-        furthest_of_all = 0
+        if state.traverse or state.is_remaining_target_empty():
+            # A traversing parser can match past the next character, and at EOF every parser should report it
+            candidates = all_choices
+        else:
+            candidates = dispatch_choices.get(state.target[state.index], unknown_choices)
+
+        furthest_of_all = state.furthest_index
 
-        for index, parser in enumerate(parsers):
-            debug("any_of ({}/{}): matching `{}` against '{}'".format(index + 1,
-                                                                      len(parsers),
-                                                                      get_function_name(parser.state_transformer),
-                                                                      state.get_target_segment()))
+        # A cut inside an alternative only commits to that alternative
+        attempt = _uncommitted(state)
 
-            temp_state = parser.state_transformer(state)
+        for index, (parser, run_parser) in enumerate(candidates):
+            if pyparse.do_debugging:
+                debug("any_of ({}/{}): matching `{}` against '{}'".format(index + 1,
+                                                                          len(candidates),
+                                                                          get_function_name(parser.state_transformer),
+                                                                          state.get_target_segment()))
+
+            temp_state = (run_parser if state.memo is None else parser)(attempt)
 
             if furthest_of_all < temp_state.furthest_index:
                 furthest_of_all = temp_state.furthest_index
 
             if not temp_state.is_error:
-                debug("any_of: found match")
+                if pyparse.do_debugging:
+                    debug("any_of: found match")
+
+                return _with_commitment(temp_state, state)
+
+            if temp_state.committed:
+                # The alternative got past a cut, the others aren't tried
+                if pyparse.do_debugging:
+                    debug("any_of: committed alternative failed")
+
                 return temp_state
 
         return state.add_error("any_of: no target matched!", furthest_of_all)
 
-    return PyParse(any_parser_transformer)
+    # Same dispatch over the children's scanners, if they all have one
+    scan_dispatch = {char: tuple(parser.scan for parser in candidates) for char, candidates in dispatch.items()}
+    scan_unknown = tuple(parser.scan for parser in unknown)
+    scan_all = tuple(parser.scan for parser in parsers)
+
+    def scan_any(target: str, index: int) -> tuple[int | None, Any, int]:
+        furthest = index
+
+        for scan in scan_dispatch.get(target[index], scan_unknown) if index < len(target) else scan_all:
+            next_index, result, furthest_index = scan(target, index)
+
+            if next_index is not None:
+                return next_index, result, furthest_index
+
+            if furthest < furthest_index:
+                furthest = furthest_index
+
+        return None, None, furthest
+
+    # If every alternative is a literal string, they can be compared directly instead of through their scanners
+    literal_dispatch = {char: tuple(parser.literal for parser in candidates) for char, candidates in dispatch.items()}
+
+    def scan_literals(target: str, index: int) -> tuple[int | None, str, int]:
+        if index < len(target):
+            for literal in literal_dispatch.get(target[index], ()):
+                if target.startswith(literal, index):
+                    return index + len(literal), literal, index + len(literal)
+
+        return None, None, index
+
+    # If every alternative is a literal or a regex the choice is a regex too, alternation also takes the first
+    # alternative that matches. Its result is the matched text either way
+    fragments = [_fragment(parser) for parser in parsers]
+    choice_pattern = None
+
+    if parsers and None not in fragments:
+        try:
+            choice_pattern = re.compile('|'.join("(?:{})".format(fragment) for fragment in fragments))
+        except re.error:
+            pass
+
+    match_choice = choice_pattern.match if choice_pattern is not None else None
+
+    def scan_choice(target: str, index: int) -> tuple[int | None, str, int]:
+        # Every alternative fails at EOF
+        match = match_choice(target, index) if index < len(target) else None
+
+        if match is None:
+            return None, None, index
+
+        end = match.end()
+        return end, match.group(0), end
+
+    if parsers and all(parser.literal is not None for parser in parsers):
+        scan = scan_literals
+    elif choice_pattern is not None:
+        scan = scan_choice
+    else:
+        scan = scan_any if all(scan_all) else None
+
+    return PyParse(any_parser_transformer, None if unknown else frozenset(dispatch), scan, pattern=choice_pattern)
+
+
+def cut(parser: PyParse) -> PyParse:
+    """Commit to the current alternative once `parser` matches
+
+    If anything after the cut fails, the nearest enclosing any_of / optional returns that error instead of trying
+    another alternative (and so does every choice above it)"""
+
+    run_parser = parser.direct_runner()
+
+    def cut_transformer(state: ParserState) -> ParserState:
+        if state.is_error:
+            return state
+
+        new_state = (run_parser if state.memo is None else parser)(state)
+
+        if new_state.is_error or new_state.committed:
+            return new_state
+
+        if pyparse.do_debugging:
+            debug("cut: committed at index {}".format(new_state.index))
+
+        return new_state.update(committed=True)
+
+    # The commit has to be seen by the choices above, which only happens in their transformers, so there's no scan
+    return PyParse(cut_transformer, parser.first_chars)
 
 
 def many(parser: PyParse, minimum_number=1) -> PyParse:
     """Match many of a target"""
 
+    def scan_matches(target: str, index: int) -> tuple[int, list, int]:
+        results = []
+        furthest = index
+
+        # match the parser as many times as we can, the lookahead of the failed attempt is ignored
+        while True:
+            next_index, result, furthest_index = parser.scan(target, index)
+
+            if next_index is None:
+                return index, results, furthest
+
+            results.append(result)
+            index = next_index
+
+            if furthest < furthest_index:
+                furthest = furthest_index
+
+    def scan_pattern_matches(target: str, index: int) -> tuple[int, list, int]:
+        results = []
+        length = len(target)
+
+        # Each scanner match starts where the last one ended, so the whole loop runs in the regex engine
+        # (finditer would search ahead for the next match instead of stopping)
+        for match in iter(parser.pattern.scanner(target, index).match, None):
+            if match.start() == length:
+                # regex() never matches at EOF
+                break
+
+            results.append(match.group(0))
+            index = match.end()
+
+        return index, results, index
+
+    if parser.pattern is not None:
+        scan_matches = scan_pattern_matches
+
+    def scan_many(target: str, index: int) -> tuple[int | None, list, int]:
+        index, results, furthest = scan_matches(target, index)
+
+        if len(results) < minimum_number:
+            return None, None, furthest
+
+        return index, results, furthest
+
+    run_parser = parser.direct_runner()
+
     def many_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
+        if parser.scan is not None and not state.traverse and not pyparse.do_debugging:
+            # The matches don't need states of their own, only the final one is built
+            index, results, furthest = scan_matches(state.target, state.index)
+            furthest = max(furthest, state.furthest_index)
+
+            if len(results) < minimum_number:
+                return state.add_error("many: {} matches, {} required!".format(len(results), minimum_number), furthest)
+
+            return state.update_result_and_index(results, index, furthest)
+
         results = []
         current = state
 
         # match the parser as many times as we can
         while True:
-            debug('many ({} found): matching many {} against {}'.format(len(results),
-                                                                        get_function_name(parser.state_transformer),
-                                                                        current.get_target_segment()))
+            if pyparse.do_debugging:
+                debug('many ({} found): matching many {} against {}'.format(len(results),
+                                                                            get_function_name(parser.state_transformer),
+                                                                            current.get_target_segment()))
 
-            temp_state = parser.state_transformer(current)
+            # A cut inside the target only commits to the current repetition
+            attempt = _uncommitted(current)
+            temp_state = (run_parser if state.memo is None else parser)(attempt)
 
             if temp_state.is_error:
+                if temp_state.committed:
+                    # The repetition got past a cut, it can't just be left out
+                    return temp_state
+
                 # failed, ignore and stop searching
                 if len(results) < minimum_number:
                     return state.add_error("many: {} matches, {} required!".format(len(results), minimum_number),
                                            current.furthest_index)
 
-                return current.update_result_and_index(results, furthest_index=current.furthest_index)
+                return _with_commitment(current.update_result_and_index(results, furthest_index=current.furthest_index),
+                                        state)
             else:
                 # found, try again
                 results.append(temp_state.result)
                 current = temp_state
                 continue
 
-    return PyParse(many_transformer)
+    # With no required matches many() can match nothing, so it could start with anything
+    return PyParse(many_transformer,
+                   parser.first_chars if minimum_number > 0 else None,
+                   scan_many if parser.scan is not None else None)
+
+
+def seperated_by(seperator: PyParse, target: PyParse, keep_seperators=True) -> PyParse:
+    """Find instances of a target seperated by a seperator
 
+    If keep_seperators is False only the targets are kept in the result"""
 
-def seperated_by(seperator: PyParse, target: PyParse) -> PyParse:
-    """Find instances of a target seperated by a seperator"""
+    run_target, run_seperator = target.direct_runner(), seperator.direct_runner()
 
     def seperated_by_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
-        debug('seperated_by: matching {} seperated by {}'.format(get_function_name(target.state_transformer),
-                                                                 get_function_name(seperator.state_transformer)))
+        if pyparse.do_debugging:
+            debug('seperated_by: matching {} seperated by {}'.format(get_function_name(target.state_transformer),
+                                                                     get_function_name(seperator.state_transformer)))
 
         results = []
 
-        current_state = target.state_transformer(state)
+        # A cut inside the target or the seperator only commits to the current value (and the seperator before it)
+        attempt = _uncommitted(state)
+        current_state = (run_target if state.memo is None else target)(attempt)
 
         if current_state.is_error:
-            # Prepend all errors
-            return current_state.assign_errors("seperated_by")
+            # Prepend all errors, only a cut the target got past commits the caller
+            error_state = current_state.assign_errors("seperated_by")
+            return error_state if error_state.committed else _with_commitment(error_state, state)
 
         while True:
             # Append our result
             results.append(current_state.result)
 
-            debug('seperated_by ({} found): found {}'.format(len(results), current_state.result))
+            if pyparse.do_debugging:
+                debug('seperated_by ({} found): found {}'.format(len(results), current_state.result))
 
             if current_state.is_remaining_target_empty():
                 # Nothing left, we're done
-                return current_state.update_result_and_index(results)
+                return _with_commitment(current_state.update_result_and_index(results), state)
 
             # Find a seperator
-            seperator_state = seperator.state_transformer(current_state)
+            attempt = _uncommitted(current_state)
+            seperator_state = (run_seperator if state.memo is None else seperator)(attempt)
 
-            # If we have no more separators we're done
-            if seperator_state.is_error or seperator_state.is_remaining_target_empty():
-                debug('seperated_by: complete, no more separators')
-                return current_state.update_result_and_index(results,
-                                                             furthest_index=seperator_state.furthest_index)
+            if seperator_state.is_error and seperator_state.committed:
+                # The seperator got past a cut, stopping before it is no longer an option
+                return seperator_state
 
-            # Find the next value
-            next_state = target.state_transformer(seperator_state)
+            # If we have no more separators we're done (unless a cut in the seperator requires a next value)
+            if seperator_state.is_error or (seperator_state.is_remaining_target_empty()
+                                            and not seperator_state.committed):
+                if pyparse.do_debugging:
+                    debug('seperated_by: complete, no more separators')
+
+                return _with_commitment(current_state.update_result_and_index(
+                    results,
+                    furthest_index=seperator_state.furthest_index
+                ), state)
+
+            # Find the next value, a cut in the seperator commits to it
+            next_state = (run_target if state.memo is None else target)(seperator_state)
 
             if next_state.is_error:
-                debug('seperated_by: complete with warning, found seperator but no next value at',
-                      next_state.furthest_index)
+                if next_state.committed:
+                    # The seperator or the value got past a cut, the value can't just be left out
+                    return next_state
+
+                if pyparse.do_debugging:
+                    debug('seperated_by: complete with warning, found seperator but no next value at',
+                          next_state.furthest_index)
+
                 # Return the results WITHOUT the last seperator
-                return current_state.update_result_and_index(
+                return _with_commitment(current_state.update_result_and_index(
                     results,
                     furthest_index=next_state.furthest_index
-                )
+                ), state)
             else:
                 # Add the seperator if there is a next value
-                results.append(seperator_state.result)
+                if keep_seperators:
+                    results.append(seperator_state.result)
 
                 current_state = next_state
 
-    return PyParse(seperated_by_transformer)
+    def scan_seperated(target_string: str, index: int) -> tuple[int | None, list, int]:
+        # Same as seperated_by_transformer, including how far every step looked
+        index, result, furthest = target.scan(target_string, index)
+
+        if index is None:
+            return None, None, furthest
+
+        results = [result]
+
+        while index < len(target_string):
+            # Find a seperator
+            seperator_index, seperator_result, furthest_index = seperator.scan(target_string, index)
+            furthest = max(furthest, furthest_index)
+
+            # If we have no more separators we're done
+            if seperator_index is None or seperator_index >= len(target_string):
+                break
+
+            # Find the next value
+            next_index, result, furthest_index = target.scan(target_string, seperator_index)
+            furthest = max(furthest, furthest_index)
+
+            if next_index is None:
+                # Return the results WITHOUT the last seperator
+                break
+
+            if keep_seperators:
+                results.append(seperator_result)
+
+            results.append(result)
+            index = next_index
+
+        return index, results, furthest
+
+    # If both are literals or regexes, every (seperator, target) pair can be matched by one pattern
+    pair_pattern = _combined_pattern((seperator, target))
+
+    def scan_seperated_pairs(target_string: str, index: int) -> tuple[int | None, list, int]:
+        index, result, furthest = target.scan(target_string, index)
+
+        if index is None:
+            return None, None, furthest
+
+        results = [result]
+
+        # Each scanner match starts where the last pair ended, a pair only matches if the next value does
+        for match in iter(pair_pattern.scanner(target_string, index).match, None):
+            if keep_seperators:
+                results.append(match.group(1))
+
+            results.append(match.group(2))
+            index = match.end()
+
+        if index < len(target_string):
+            # Like scan_seperated, remember how far the last seperator looked (it may have matched before no value)
+            furthest = max(furthest, seperator.scan(target_string, index)[2])
+
+        return index, results, max(furthest, index)
+
+    if pair_pattern is not None:
+        scan = scan_seperated_pairs
+    else:
+        scan = scan_seperated if target.scan is not None and seperator.scan is not None else None
+
+    return PyParse(seperated_by_transformer, target.first_chars, scan)
 
 
 def lazy(provider: Callable[[], PyParse]) -> PyParse:
-    """Don't load the target until its being called, enables recursion within parsers"""
+    """Don't load the target until its being called, enables recursion within parsers
+
+    The provider is only called once, the parser it returns is reused for every call after that"""
+
+    resolved = []
 
     def lazy_transformer(state: ParserState) -> ParserState:
         if state.is_error:
             return state
 
-        parser = provider()
+        if not resolved:
+            parser = provider()
+            resolved.extend((parser, parser.direct_runner()))
+
+            if pyparse.do_debugging:
+                debug("lazy: loaded " + get_function_name(resolved[0].state_transformer))
 
-        debug("lazy: loaded " + get_function_name(parser.state_transformer))
+        parser, run_parser = resolved
 
-        return parser.state_transformer(state)
+        return (run_parser if state.memo is None else parser)(state)
 
     return PyParse(lazy_transformer)
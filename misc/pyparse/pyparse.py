@@ -1,7 +1,7 @@
 import dataclasses
 import inspect
-import misc.pyparse.parsers as p
 from collections.abc import Callable, Sequence
+from re import Pattern
 from typing import Any, ClassVar
 
 
@@ -13,20 +13,68 @@ from typing import Any, ClassVar
 # but I am using them like immutable structs with helper methods so it's okay :)
 
 
+# isinstance(x, Sequence) goes through the ABC machinery, so the answer is remembered per class
+_ITERABLE_CACHE: dict[type, bool] = {}
+
+
 def is_iterable(maybe_iterable: Any) -> bool:
-    return isinstance(maybe_iterable, Sequence) and not isinstance(maybe_iterable, str)
+    kind = type(maybe_iterable)
+
+    # Parsers only ever produce lists (and tuples), anything else came from a map and gets the full check
+    if kind is list or kind is tuple:
+        return True
+
+    iterable = _ITERABLE_CACHE.get(kind)
+
+    if iterable is None:
+        iterable = _ITERABLE_CACHE[kind] = issubclass(kind, Sequence) and not issubclass(kind, str)
+
+    return iterable
+
+
+# Marks that a sequence being written has run out
+_END = object()
+
+
+def maybe_iterable__to_string(maybe_iterable: Sequence | Any, joiner: str = ' ') -> str:
+    if not is_iterable(maybe_iterable):
+        return str(maybe_iterable)
+
+    out = ['[']
+    # [iterator, has written an element] for every sequence still open, innermost last
+    stack = [[iter(maybe_iterable), False]]
+
+    while stack:
+        frame = stack[-1]
+        current = next(frame[0], _END)
 
+        if current is _END:
+            stack.pop()
+            out.append(']')
+            continue
 
-def maybe_iterable__to_string(maybe_iterable: Sequence | Any, joiner: str = ' ') -> str | list[str]:
-    return '[{}]'.format(joiner.join([maybe_iterable__to_string(current, joiner) for current in maybe_iterable])) \
-        if is_iterable(maybe_iterable) \
-        else str(maybe_iterable)
+        if frame[1]:
+            out.append(joiner)
+
+        frame[1] = True
+
+        if is_iterable(current):
+            out.append('[')
+            stack.append([iter(current), False])
+        else:
+            out.append(str(current))
+
+    return ''.join(out)
 
 
 ResultProvider = Callable[[], Any]
 
+# Errors are kept as a linked chain of (text, is_prefix, rest) links, most recent first, so adding one never
+# copies the others. A prefix link (from assign_errors) applies to every message further down the chain
+ErrorChain = tuple[str, bool, Any] | None
 
-@dataclasses.dataclass(frozen=True)
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class ParserState:
     """State of the target. Do not directly modify the state, instead use:
 
@@ -34,16 +82,27 @@ class ParserState:
         - update_result(Any, next_index)
         - add_error(str)
         - add_errors(list[str])
-        """
 
-    total_transformations: ClassVar[int] = None
+    `memo` is the packrat table shared by every state of a run started with `PyParse.run(..., memoize=True)`
+
+    `rule_memo` is the table shared by every state of a run for the parsers built with `PyParse.memoize()`
+
+    `committed` is set once a cut() has matched, any_of and optional won't try anything else after a committed error
+
+    Errors are only flattened into a list when read through `errors` / `get_errors()`
+    """
+
+    total_transformations: ClassVar[int] = 0
     target: str = None
     traverse: bool = False
     index: int = 0
     furthest_index: int = 0
     result: Any = None
     is_error: bool = False
-    errors: list[str] = dataclasses.field(default_factory=list)
+    error_chain: ErrorChain = None
+    committed: bool = False
+    memo: dict[tuple[Callable, int, bool], 'ParserState'] | None = None
+    rule_memo: dict[tuple[Callable, int, bool], 'ParserState'] | None = None
 
     def update(self,
                target: str = None,
@@ -52,7 +111,8 @@ class ParserState:
                furthest_index: int = None,
                result: Any | Callable[[], Any] = None,
                is_error: bool = None,
-               errors: list[str] = None):
+               error_chain: ErrorChain = None,
+               committed: bool = None):
         """Update a ParserState.
 
         Will use values from this instance to fill any fields not passed into the constructor
@@ -64,37 +124,67 @@ class ParserState:
             - index          (default 0) : The index of the string we are currently at
             - result                     : The current parsed result. Can be a provider function (used to set None)
             - is_error   (default False) : If an error has been encountered
-            - errors (default list[str]) : A string list of errors"""
+            - error_chain (default None) : The chain of errors, see ErrorChain
+            - committed  (default False) : If a cut has been passed, see parsers.cut"""
+
+        if index is None:
+            index = self.index
+
+        if furthest_index is None:
+            furthest_index = self.furthest_index
+
+        if index > furthest_index:
+            furthest_index = index
+
+        if result is None:
+            result = self.result
+        elif callable(result):
+            # If the result is a provider, build it first
+            result = result()
+
+        # Build the new state directly, dataclasses.replace would re-inspect the fields on every call
+        # Arguments are positional (in field order) to skip matching keywords in the generated __init__
+        updated = ParserState(target if target is not None else self.target,
+                              traverse if traverse is not None else self.traverse,
+                              index,
+                              furthest_index,
+                              result,
+                              is_error if is_error is not None else self.is_error,
+                              error_chain if error_chain is not None else self.error_chain,
+                              committed if committed is not None else self.committed,
+                              self.memo,
+                              self.rule_memo)
+
+        ParserState.total_transformations += 1
+        if do_debugging:
+            debug(updated.get_state_string(True))
 
-        args = {
-            "target": target,
-            "traverse": traverse,
-            "index": index,
-            "furthest_index": furthest_index if furthest_index is not None else self.furthest_index,
-            "result": result,
-            "is_error": is_error,
-            "errors": errors
-        }
+        return updated
 
-        t_idx = index if index is not None else self.index
+    # Helper Functions
 
-        if t_idx is not None and t_idx > args["furthest_index"]:
-            args["furthest_index"] = t_idx
+    @property
+    def errors(self) -> list[str]:
+        """All errors, most recent first"""
 
-        composed = {key: value for (key, value) in args.items() if value is not None}
+        return self.get_errors()
 
-        # If the result is a provider, build it first
-        if isinstance(result, Callable):
-            composed["result"] = result()
+    def get_errors(self) -> list[str]:
+        """Flatten the error chain into a list, most recent first"""
 
-        updated = dataclasses.replace(self, **composed)
+        errors = []
+        prefix = ""
+        link = self.error_chain
 
-        ParserState.total_transformations += 1
-        debug(updated.get_state_string(True))
+        while link is not None:
+            text, is_prefix, link = link
 
-        return updated
+            if is_prefix:
+                prefix += text + ": "
+            else:
+                errors.append(prefix + text)
 
-    # Helper Functions
+        return errors
 
     def get_string_result(self, joiner: str = ' '):
         """Get the result as a string"""
@@ -102,14 +192,16 @@ class ParserState:
         return maybe_iterable__to_string(self.result, joiner)
 
     def get_target_segment(self, start_index: int = None) -> str:
-        """The current segment of the target string according to _target[(start_index|_index):]"""
+        """The current segment of the target string according to _target[(start_index|_index):]
+
+        This copies the rest of the target, so parsers only use it for debugging and error messages"""
 
         return self.target[(start_index if start_index is not None else self.index):]
 
     def has_chars_remaining(self, num_chars: int, start_index: int = None):
         """If there are num_chars remaining in get_target_segment(start_index)"""
 
-        return len(self.get_target_segment(start_index)) >= num_chars
+        return len(self.target) - (start_index if start_index is not None else self.index) >= num_chars
 
     def is_remaining_target_empty(self, start_index: int = None):
         """If the target has no more remaining characters"""
@@ -124,7 +216,9 @@ class ParserState:
     def get_incomplete_match(self):
         """Get the area of the target where the error occurred"""
 
-        return self.get_target_segment(self.furthest_index - 10 if self.furthest_index > 10 else 0)[:20]
+        start_index = self.furthest_index - 10 if self.furthest_index > 10 else 0
+
+        return self.target[start_index:start_index + 20]
 
     # State Updaters
 
@@ -148,14 +242,15 @@ class ParserState:
 
         Copies all other values from self"""
 
-        debug("{}: updating: result (`{}` -> `{}`), index ({} -> {})".format(
-            self._instance_name(),
-            self.result,
-            new_result() if isinstance(new_result, Callable) else new_result,
-            self.index,
-            next_index if next_index is not None
-            else self.index)
-        )
+        if do_debugging:
+            debug("{}: updating: result (`{}` -> `{}`), index ({} -> {})".format(
+                self._instance_name(),
+                self.result,
+                new_result() if callable(new_result) else new_result,
+                self.index,
+                next_index if next_index is not None
+                else self.index)
+            )
 
         return self.update(result=new_result,
                            index=next_index,
@@ -177,23 +272,29 @@ class ParserState:
 
         return self.update(furthest_index=index,
                            is_error=True,
-                           errors=[message] + self.errors)
+                           error_chain=(message, False, self.error_chain))
 
     def add_errors(self, messages: list[str], index: int = None):
         """Returns a new ParserState with _is_error=True and _errors containing messages
 
         Copies all other values from self"""
 
+        chain = self.error_chain
+
+        # Link from the back so messages[0] ends up first
+        for message in reversed(messages):
+            chain = (message, False, chain)
+
         return self.update(furthest_index=index,
                            is_error=True,
-                           errors=messages + self.errors)
+                           error_chain=chain)
 
     def assign_errors(self, parser_name: str):
         """Returns a new ParserState with all errors prefixed by 'parser_name: '
 
         Copies all other values from self"""
 
-        return self.update(errors=['{}: {}'.format(parser_name, error) for error in self.errors])
+        return self.update(error_chain=(parser_name, True, self.error_chain))
 
     # Class Functions
 
@@ -241,6 +342,10 @@ class ParserState:
 
 
 ParserStateTransformer = Callable[[ParserState], ParserState]
+
+# Fast path for parsers that don't need a ParserState: (target, index) -> (next_index, result, furthest_index)
+# A failed scan returns (None, None, furthest_index), furthest_index is how far it looked either way
+Scanner = Callable[[str, int], tuple[int | None, Any, int]]
 ResultTransformer = Callable[[Any], Any]
 
 
@@ -252,17 +357,83 @@ class PyParse:
     State transformers take in a ParserState and return a new state asthe result of their processing
 
     Multiple parsers (by association their state_transformer) can be chained together for more complex parsing
-    (even recursively)"""
+    (even recursively)
+
+    `first_chars` is the set of characters a match can start with, or None if unknown. any_of uses it to skip
+    alternatives that can't match the next character
+
+    `scan` is an optional Scanner that must agree with state_transformer (without traversal) on success, index,
+    result and furthest index. Combinators build theirs out of their children's at construction time, so a tree
+    of scannable parsers runs as direct function calls with a single ParserState built at the end. The
+    transformer is only run when the scan fails and an error is needed
+
+    `literal` is the exact string a string() parser matches, so combinators can compare against it directly
+
+    `pattern` is the compiled pattern a regex() parser matches, so combinators can build bigger patterns out of it"""
 
     state_transformer: ParserStateTransformer
+    first_chars: frozenset[str] | None = None
+    scan: Scanner | None = None
+    literal: str | None = None
+    pattern: Pattern[str] | None = None
+
+    def __call__(self, state: ParserState) -> ParserState:
+        """Run the state transformer on a state. Chained parsers should call each other through this
+
+        Without a scan or a memo table this only calls the transformer, so combinators call their child's
+        `direct_runner` instead outside memoized runs (`(run_child if state.memo is None else child)(state)`),
+        saving a stack frame for every level of recursion
+
+        If the run is memoized the result is cached per (transformer, index) so backtracking never
+        parses the same position with the same parser twice"""
+
+        if self.scan is not None and not state.is_error and not state.traverse and not do_debugging:
+            next_index, result, furthest_index = self.scan(state.target, state.index)
+
+            if next_index is not None:
+                return state.update(index=next_index,
+                                    result=result if result is not None else lambda: None,
+                                    furthest_index=max(furthest_index, state.furthest_index))
 
-    def run(self, target: str, traverse=False) -> ParserState:
+            # The scan failed, run the transformer to build the error
+
+        if state.memo is None or state.is_error:
+            return self.state_transformer(state)
+
+        # The lookup is inlined (and copied in memoize) so a memoized run adds one frame per parser, not two
+        # The transformer itself is the key (not its id) so it can't be collected and have its id reused
+        # A committed state carries its flag into the result, so it is cached separately
+        key = (self.state_transformer, state.index, state.committed)
+        cached = state.memo.get(key)
+
+        if cached is None:
+            # Only cache how far the parser itself looked, the caller's furthest index is merged back in below
+            start = state if state.furthest_index == state.index else state.update(furthest_index=state.index)
+            cached = state.memo[key] = self.state_transformer(start)
+        elif do_debugging:
+            debug("{}: memoized result at index {}".format(self._instance_name(), state.index))
+
+        if cached.furthest_index < state.furthest_index:
+            return cached.update(furthest_index=state.furthest_index)
+
+        return cached
+
+    def run(self, target: str, traverse=False, memoize=False) -> ParserState:
         """INITIAL run method. Do not run this on every target in a call, it will not work
 
-        Chained parsers will call each other"""
+        Chained parsers will call each other
+
+        If memoize is set, every parser result is cached by index for the duration of this run (packrat parsing)"""
 
         # Begin the callchain >:)
-        return self.state_transformer(ParserState(target=target, traverse=traverse))
+        return self(ParserState(target=target, traverse=traverse, memo={} if memoize else None, rule_memo={}))
+
+    def direct_runner(self) -> ParserStateTransformer:
+        """What to call instead of this parser outside a memoized run, decided once when a combinator is built
+
+        That's the transformer itself, unless there is a scan for __call__ to try first"""
+
+        return self.state_transformer if self.scan is None else self
 
     def map(self, result_transformer: ResultTransformer) -> 'PyParse':
         """Apply a result transformer to the current state transformer function
@@ -270,15 +441,18 @@ class PyParse:
         The transformer function will be called on the result of a successful match by the base transformer function
         """
 
+        run_self = self.direct_runner()
+
         def map_transformer(state: ParserState) -> ParserState:
-            new_state = self.state_transformer(state)
+            new_state = (run_self if state.memo is None else self)(state)
 
             if not new_state.is_error:
                 mapped_result = result_transformer(new_state.result)
 
-                debug("{}: mapped result: `{}` -> `{}`".format(self._instance_name(),
-                                                               new_state.result,
-                                                               mapped_result))
+                if do_debugging:
+                    debug("{}: mapped result: `{}` -> `{}`".format(self._instance_name(),
+                                                                   new_state.result,
+                                                                   mapped_result))
 
                 return new_state.update(result=mapped_result)
 
@@ -286,15 +460,116 @@ class PyParse:
 
         map_transformer.__name__ = get_function_name(self.state_transformer) + "_with_map_transform"
 
-        return PyParse(map_transformer)
+        def scan_map(target: str, index: int) -> tuple[int | None, Any, int]:
+            next_index, result, furthest_index = self.scan(target, index)
+
+            if next_index is None:
+                return next_index, result, furthest_index
+
+            mapped_result = result_transformer(result)
+
+            # update() keeps the previous result when given None, so does this
+            return next_index, mapped_result if mapped_result is not None else result, furthest_index
+
+        return PyParse(map_transformer, self.first_chars, scan_map if self.scan is not None else None)
 
     def between(self, left: 'PyParse', right: 'PyParse' = None) -> 'PyParse':
         """Require that this parser match in between the left parser and right parser
 
         Left/Right parsers will not be included in the final result"""
 
-        return p.sequence_of(left, self, right if right is not None else left) \
-            .map(lambda x: x[1] if is_iterable(x) else x)
+        right = right if right is not None else left
+        run_left, run_self, run_right = left.direct_runner(), self.direct_runner(), right.direct_runner()
+
+        def between_transformer(state: ParserState) -> ParserState:
+            if state.is_error:
+                return state
+
+            if do_debugging:
+                debug("between: matching `{}` between `{}` and `{}` against '{}'".format(
+                    get_function_name(self.state_transformer),
+                    get_function_name(left.state_transformer),
+                    get_function_name(right.state_transformer),
+                    state.get_target_segment()))
+
+            left_state = (run_left if state.memo is None else left)(state)
+
+            if left_state.is_error:
+                return left_state
+
+            middle_state = (run_self if state.memo is None else self)(left_state)
+
+            if middle_state.is_error:
+                return middle_state
+
+            right_state = (run_right if state.memo is None else right)(middle_state)
+
+            if right_state.is_error:
+                return right_state
+
+            # Only keep the middle result
+            return right_state.update(result=middle_state.result if middle_state.result is not None else lambda: None)
+
+        def scan_between(target: str, index: int) -> tuple[int | None, Any, int]:
+            furthest = index
+
+            index, _, furthest_index = left.scan(target, index)
+            furthest = max(furthest, furthest_index)
+
+            if index is None:
+                return None, None, furthest
+
+            index, result, furthest_index = self.scan(target, index)
+            furthest = max(furthest, furthest_index)
+
+            if index is None:
+                return None, None, furthest
+
+            index, _, furthest_index = right.scan(target, index)
+            furthest = max(furthest, furthest_index)
+
+            if index is None:
+                return None, None, furthest
+
+            return index, result, furthest
+
+        scannable = left.scan is not None and self.scan is not None and right.scan is not None
+
+        return PyParse(between_transformer, left.first_chars, scan_between if scannable else None)
+
+    def memoize(self) -> 'PyParse':
+        """Cache the results of this parser by index, even when the run isn't memoized
+
+        Use it on rules that are retried at the same index (ie. recursive rules behind a lazy in an any_of).
+        The cache belongs to the run, every run starts with an empty one"""
+
+        def memoize_transformer(state: ParserState) -> ParserState:
+            if state.is_error:
+                return state
+
+            # A state built by hand (not by run) has nowhere to keep the cache
+            if state.rule_memo is None:
+                return self.state_transformer(state)
+
+            # Same lookup as in __call__, see there
+            key = (self.state_transformer, state.index, state.committed)
+            cached = state.rule_memo.get(key)
+
+            if cached is None:
+                start = state if state.furthest_index == state.index else state.update(furthest_index=state.index)
+                cached = state.rule_memo[key] = self.state_transformer(start)
+            elif do_debugging:
+                debug("{}: memoized result at index {}".format(self._instance_name(), state.index))
+
+            if cached.furthest_index < state.furthest_index:
+                return cached.update(furthest_index=state.furthest_index)
+
+            return cached
+
+        memoize_transformer.__name__ = get_function_name(self.state_transformer) + "_memoized"
+
+        # A successful scan builds no states, so there's nothing to cache on it
+        return PyParse(memoize_transformer, self.first_chars, self.scan, self.literal, self.pattern)
 
     def _instance_name(self):
         return "PyParse: {}".format(hex(id(self)))
@@ -319,13 +594,17 @@ def setup_debugging(enable_logging: bool = False):
 
 
 def debug(*varargs: Any):
-    if do_debugging:
-        print('debug: ', *varargs)
-        print()
+    """Print a debug message. Callers check `do_debugging` first so the message is never built for nothing"""
+
+    if not do_debugging:
+        return
+
+    print('debug: ', *varargs)
+    print()
 
     global max_call_depth
 
-    # Calculate max recursion depth
+    # Calculate max recursion depth, inspect.stack walks every frame so this only happens while debugging
     stack_size = len(inspect.stack(0))
     if stack_size > max_call_depth:
         max_call_depth = stack_size